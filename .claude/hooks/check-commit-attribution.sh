@@ -0,0 +1,50 @@
+#!/usr/bin/env bash
+#
+# Hook to block git commits containing Claude/AI attribution.
+# Works for both PermissionRequest and PreToolUse events.
+#
+# Written in shell so the common (non-commit) case costs a single process
+# start rather than a Python interpreter boot on every Bash tool use.
+
+set -uo pipefail
+
+input="$(cat)"
+
+# Only check git commit commands; skip JSON parsing entirely otherwise
+[[ "$input" == *"git commit"* ]] || exit 0
+
+# json_field prints the string at the given jq path from the hook input.
+# Falls back to python3 when jq is not installed.
+json_field() {
+  if command -v jq >/dev/null 2>&1; then
+    printf '%s' "$input" | jq -r "$1 // \"\""
+  else
+    printf '%s' "$input" | python3 -c '
+import json, sys
+value = json.load(sys.stdin)
+for key in sys.argv[1].lstrip(".").split("."):
+    value = value.get(key, "") if isinstance(value, dict) else ""
+print(value if isinstance(value, str) else "")
+' "$1"
+  fi
+}
+
+command="$(json_field .tool_input.command)"
+[[ "$command" == *"git commit"* ]] || exit 0
+
+shopt -s nocasematch
+[[ "$command" == *"co-authored-by: claude"* ]] || exit 0
+
+message="BLOCKED: Remove AI/Claude attribution. Regenerate commit message without Co-Authored-By or 'Generated with' lines."
+
+if [[ "$(json_field .hook_event_name)" == "PermissionRequest" ]]; then
+  # PermissionRequest uses JSON output with decision
+  cat <<JSON
+{"hookSpecificOutput": {"hookEventName": "PermissionRequest", "decision": {"behavior": "deny", "message": "$message"}}}
+JSON
+  exit 0
+fi
+
+# PreToolUse uses exit code 2 with stderr message
+echo "$message" >&2
+exit 2
@@ -4,10 +4,14 @@
 import argparse
 import os
 import random
+import re
 import sys
+from bisect import bisect_right
 from dataclasses import dataclass, field
+from functools import partial
+from itertools import accumulate
 
-FALLBACK_WORDS = [
+FALLBACK_WORDS = (
     "apple", "banana", "cherry", "delta", "echo", "falcon", "grape", "harbor",
     "island", "jungle", "kettle", "lantern", "marble", "nectar", "olive",
     "pebble", "quartz", "river", "sunset", "timber", "umbrella", "valley",
@@ -23,7 +27,17 @@ FALLBACK_WORDS = [
     "urchin", "vivid", "walnut", "branch", "clover", "dagger", "ember",
     "floral", "gravel", "hidden", "indigo", "jumble", "kindly", "locket",
     "mosaic", "nutmeg", "orchid", "plunge", "riddle", "spiral", "trophy",
-]
+)
+FALLBACK_WORDS_CAP = tuple(w.capitalize() for w in FALLBACK_WORDS)
+
+# Markdown lists hold at most this many items; numbered items index
+# NUM_PREFIXES rather than formatting "N. " each time
+MAX_LIST_ITEMS = 6
+NUM_PREFIXES = tuple(f"{i}. " for i in range(1, MAX_LIST_ITEMS + 1))
+
+# Dictionary entries worth keeping: short, all-lowercase ASCII words. Lines
+# with non-ASCII letters ("café") or surrounding whitespace are dropped.
+WORD_RE = re.compile(rb"[a-z]{3,12}")
 
 
 def parse_args():
@@ -73,62 +87,110 @@ def parse_args():
     return args
 
 
+class CapitalizedWords(dict):
+    # word -> word.capitalize(), filled in as words are drawn so a large
+    # dictionary is never capitalized up front
+    def __missing__(self, word):
+        result = self[word] = word.capitalize()
+        return result
+
+
 def load_words(dictionary_path):
+    # Returns the word pool and a lazy word -> capitalized word mapping
     try:
-        with open(dictionary_path) as f:
-            words = [
-                line.strip() for line in f
-                if line.strip().isalpha()
-                and line.strip().islower()
-                and 3 <= len(line.strip()) <= 12
-            ]
+        with open(dictionary_path, "rb") as f:
+            lines = f.read().splitlines()
+        match = WORD_RE.fullmatch
+        words = [line.decode() for line in lines if match(line)]
         if len(words) >= 50:
-            return words
+            return words, CapitalizedWords()
     except OSError:
         pass
-    return list(FALLBACK_WORDS)
+    return FALLBACK_WORDS, CapitalizedWords(zip(FALLBACK_WORDS, FALLBACK_WORDS_CAP))
 
 
 def generate_name(rng, words, num_parts=None):
     if num_parts is None:
         num_parts = rng.randint(1, 2)
-    return "-".join(rng.choice(words) for _ in range(num_parts))
+    return "-".join(rng.choices(words, k=num_parts))
 
 
-def resolve_collision(base_path):
-    if not os.path.exists(base_path):
-        return base_path
+def candidate_paths(base_path):
+    yield base_path
     root, ext = os.path.splitext(base_path)
     counter = 2
     while True:
-        candidate = f"{root}-{counter}{ext}"
-        if not os.path.exists(candidate):
-            return candidate
+        yield f"{root}-{counter}{ext}"
         counter += 1
 
 
-def make_sentences(rng, words, target_word_count):
-    result = []
+def claim_path(base_path, taken):
+    # Reserve the first of base_path, base-2, base-3, ... not yet taken
+    for path in candidate_paths(base_path):
+        if path not in taken:
+            taken.add(path)
+            return path
+
+
+def write_file(planned):
+    # Planned names can still clash on disk (late arrivals, case-insensitive
+    # filesystems), so retry with the next -N suffix; returns the path used
+    base_path, data = planned
+    for path in candidate_paths(base_path):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            continue
+        break
+    try:
+        # os.write may write fewer bytes than asked (e.g. disk full)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    return path
+
+
+def write_files(plan):
+    return [write_file(planned) for planned in plan]
+
+
+def make_new_dir(base_path):
+    # Create the first of base_path, base-2, base-3, ... that does not exist
+    for path in candidate_paths(base_path):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            continue
+        return path
+
+
+def make_sentences(rng, words, capitalized, target_word_count):
+    # Yields (sentence, word_count) pairs totalling target_word_count words
+    choice = rng.choice
+    choices = rng.choices
+    randint = rng.randint
     remaining = target_word_count
     while remaining > 0:
-        length = min(rng.randint(5, 15), remaining)
-        sentence_words = [rng.choice(words) for _ in range(length)]
-        sentence_words[0] = sentence_words[0].capitalize()
-        result.append(" ".join(sentence_words) + ".")
+        length = min(randint(5, 15), remaining)
+        first = capitalized[choice(words)]
+        sentence = " ".join((first, *choices(words, k=length - 1)))
+        yield sentence + ".", length
         remaining -= length
-    return result
 
 
-def generate_plaintext(rng, words, min_words, max_words):
+def generate_plaintext(rng, words, capitalized, min_words, max_words):
     total_words = rng.randint(min_words, max_words)
-    sentences = make_sentences(rng, words, total_words)
+    # Materialize before drawing para_limit to keep the seeded draw order
+    sentences = list(make_sentences(rng, words, capitalized, total_words))
     paragraphs = []
     current = []
     word_count = 0
     para_limit = rng.randint(20, 60)
-    for sentence in sentences:
+    for sentence, length in sentences:
         current.append(sentence)
-        word_count += len(sentence.split())
+        word_count += length
         if word_count >= para_limit:
             paragraphs.append(" ".join(current))
             current = []
@@ -139,53 +201,73 @@ def generate_plaintext(rng, words, min_words, max_words):
     return "\n\n".join(paragraphs) + "\n"
 
 
-def generate_markdown(rng, words, min_words, max_words):
-    total_words = rng.randint(min_words, max_words)
-    title = " ".join(rng.choice(words).capitalize() for _ in range(rng.randint(2, 5)))
-    lines = [f"# {title}", ""]
+def generate_markdown(rng, words, capitalized, min_words, max_words):
+    choice = rng.choice
+    choices = rng.choices
+    randint = rng.randint
+    total_words = randint(min_words, max_words)
+    title = " ".join([capitalized[w] for w in choices(words, k=randint(2, 5))])
+    sections = [f"# {title}"]
     remaining = total_words
 
     while remaining > 0:
         # Choose section type: paragraph, heading+paragraph, bullet list, numbered list
-        section_type = rng.choices(
+        section_type = choices(
             ["paragraph", "heading", "bullets", "numbered"],
             weights=[5, 2, 2, 1],
         )[0]
 
         if section_type == "heading":
-            level = rng.choice(["##", "###"])
+            level = choice(["##", "###"])
             heading_text = " ".join(
-                rng.choice(words).capitalize() for _ in range(rng.randint(2, 4))
+                [capitalized[w] for w in choices(words, k=randint(2, 4))]
             )
-            lines.append(f"{level} {heading_text}")
-            lines.append("")
+            sections.append(f"{level} {heading_text}")
 
-        chunk_words = min(rng.randint(15, 50), remaining)
+        chunk_words = min(randint(15, 50), remaining)
 
         if section_type in ("paragraph", "heading"):
-            sentences = make_sentences(rng, words, chunk_words)
-            lines.append(" ".join(sentences))
-            lines.append("")
+            sentences = make_sentences(rng, words, capitalized, chunk_words)
+            sections.append(" ".join(sentence for sentence, _ in sentences))
         elif section_type == "bullets":
-            items = rng.randint(3, 6)
+            items = randint(3, MAX_LIST_ITEMS)
             words_per_item = max(chunk_words // items, 1)
+            lines = []
             for _ in range(items):
-                item_words = [rng.choice(words) for _ in range(words_per_item)]
-                item_words[0] = item_words[0].capitalize()
-                lines.append(f"- {' '.join(item_words)}")
-            lines.append("")
+                first = capitalized[choice(words)]
+                item_words = (first, *choices(words, k=words_per_item - 1))
+                lines.append("- " + " ".join(item_words))
+            sections.append("\n".join(lines))
         elif section_type == "numbered":
-            items = rng.randint(3, 6)
+            items = randint(3, MAX_LIST_ITEMS)
             words_per_item = max(chunk_words // items, 1)
+            lines = []
             for i in range(items):
-                item_words = [rng.choice(words) for _ in range(words_per_item)]
-                item_words[0] = item_words[0].capitalize()
-                lines.append(f"{i + 1}. {' '.join(item_words)}")
-            lines.append("")
+                first = capitalized[choice(words)]
+                item_words = (first, *choices(words, k=words_per_item - 1))
+                lines.append(NUM_PREFIXES[i] + " ".join(item_words))
+            sections.append("\n".join(lines))
 
         remaining -= chunk_words
 
-    return "\n".join(lines)
+    return "\n\n".join(sections) + "\n"
+
+
+def build_action_tables(args):
+    # Map (can_descend, first_iteration) to (actions, cumulative weights)
+    tables = {}
+    for can_descend in (True, False):
+        for first_iteration in (True, False):
+            actions = ["file"]
+            weights = [args.weight_file]
+            if can_descend:
+                actions.append("dir")
+                weights.append(args.weight_dir)
+            if not first_iteration:
+                actions.append("finish")
+                weights.append(args.weight_finish)
+            tables[can_descend, first_iteration] = (actions, list(accumulate(weights)))
+    return tables
 
 
 @dataclass
@@ -195,50 +277,51 @@ class TreeState:
     max_depth_reached: int = 0
     txt_count: int = 0
     md_count: int = 0
-
-
-def populate_directory(path, depth, args, rng, words, state):
-    os.makedirs(path, exist_ok=True)
-    if depth > state.max_depth_reached:
-        state.max_depth_reached = depth
-
-    first_iteration = True
-    while state.files_created < args.max_files:
-        # Build action weights
-        actions = []
-        weights = []
-
-        actions.append("file")
-        weights.append(args.weight_file)
-
-        if depth < args.max_depth:
-            actions.append("dir")
-            weights.append(args.weight_dir)
-
-        if not first_iteration:
-            actions.append("finish")
-            weights.append(args.weight_finish)
-
-        first_iteration = False
-
-        if not any(w > 0 for w in weights):
-            break
-
-        action = rng.choices(actions, weights=weights)[0]
+    # Verbose lines, written to stderr in one go once the tree is planned
+    verbose_buf: list[str] = field(default_factory=list)
+
+
+def populate_directory(root, args, rng, words, gen_txt, gen_md, state):
+    # Creates directories as it goes and returns the (path, bytes) files to
+    # write; only root's existing entries can clash with planned names
+    # Read the run-wide settings once; the loop below only touches locals
+    max_files = args.max_files
+    max_depth = args.max_depth
+    md_ratio = args.md_ratio
+    verbose = args.verbose
+
+    plan = []
+    tables = build_action_tables(args)
+    taken = {os.path.join(root, name) for name in os.listdir(root)}
+
+    # Depth-first walk driven by an explicit stack of
+    # (path, rel_path, depth, first_iteration) frames; the top frame is the
+    # directory currently being filled. rel_path is path relative to root,
+    # carried along so verbose lines need no os.path.relpath.
+    stack = [(root, "", 0, True)]
+    while stack and state.files_created < max_files:
+        path, rel_path, depth, first_iteration = stack.pop()
+
+        actions, cum_weights = tables[depth < max_depth, first_iteration]
+        total = cum_weights[-1]
+        if total <= 0:
+            continue
+
+        # Same draw as rng.choices(actions, weights=...) without rebuilding
+        # the cumulative weights every iteration
+        hi = len(cum_weights) - 1
+        action = actions[bisect_right(cum_weights, rng.random() * total, 0, hi)]
 
         if action == "file":
-            is_md = rng.random() < args.md_ratio
+            stack.append((path, rel_path, depth, False))
+
+            is_md = rng.random() < md_ratio
             ext = ".md" if is_md else ".txt"
             name = generate_name(rng, words) + ext
-            file_path = resolve_collision(os.path.join(path, name))
-
-            if is_md:
-                content = generate_markdown(rng, words, args.min_words, args.max_words)
-            else:
-                content = generate_plaintext(rng, words, args.min_words, args.max_words)
+            content = gen_md() if is_md else gen_txt()
 
-            with open(file_path, "w") as f:
-                f.write(content)
+            file_path = claim_path(os.path.join(path, name), taken)
+            plan.append((file_path, content.encode()))
 
             state.files_created += 1
             if is_md:
@@ -246,37 +329,68 @@ def populate_directory(path, depth, args, rng, words, state):
             else:
                 state.txt_count += 1
 
-            if args.verbose:
-                rel = os.path.relpath(file_path, args.output_dir)
-                print(f"  FILE {rel}", file=sys.stderr)
+            if verbose:
+                rel = os.path.join(rel_path, os.path.basename(file_path))
+                state.verbose_buf.append(f"  FILE {rel}")
 
         elif action == "dir":
+            stack.append((path, rel_path, depth, False))
+
             dir_name = generate_name(rng, words)
-            dir_path = resolve_collision(os.path.join(path, dir_name))
+            dir_path = make_new_dir(os.path.join(path, dir_name))
+            taken.add(dir_path)
             state.dirs_created += 1
+            if depth + 1 > state.max_depth_reached:
+                state.max_depth_reached = depth + 1
+
+            dir_rel = os.path.join(rel_path, os.path.basename(dir_path))
+            if verbose:
+                state.verbose_buf.append(f"  DIR  {dir_rel}/")
 
-            if args.verbose:
-                rel = os.path.relpath(dir_path, args.output_dir)
-                print(f"  DIR  {rel}/", file=sys.stderr)
+            stack.append((dir_path, dir_rel, depth + 1, True))
 
-            populate_directory(dir_path, depth + 1, args, rng, words, state)
+        # "finish" leaves the frame popped, returning to the parent directory
 
-        elif action == "finish":
-            break
+    return plan
 
 
 def main():
     args = parse_args()
     rng = random.Random(args.seed)
-    words = load_words(args.dictionary)
+    words, capitalized = load_words(args.dictionary)
 
     if args.verbose:
         print(f"Loaded {len(words)} dictionary words.", file=sys.stderr)
         print(f"Building tree in {args.output_dir} ...", file=sys.stderr)
 
+    # Bind the per-run generator arguments once rather than per file
+    gen_txt = partial(
+        generate_plaintext, rng, words, capitalized, args.min_words, args.max_words
+    )
+    gen_md = partial(
+        generate_markdown, rng, words, capitalized, args.min_words, args.max_words
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
     state = TreeState()
     # The root itself is not counted as a created directory
-    populate_directory(args.output_dir, 0, args, rng, words, state)
+    plan = populate_directory(
+        args.output_dir, args, rng, words, gen_txt, gen_md, state
+    )
+
+    # Flush before writing so the planned tree is visible if a write fails
+    if state.verbose_buf:
+        sys.stderr.write("\n".join(state.verbose_buf) + "\n")
+
+    written = write_files(plan)
+    if args.verbose:
+        for (planned_path, _), path in zip(plan, written):
+            if path != planned_path:
+                print(
+                    f"  RENAMED {os.path.relpath(planned_path, args.output_dir)}"
+                    f" -> {os.path.relpath(path, args.output_dir)}",
+                    file=sys.stderr,
+                )
 
     print(
         f"Generated tree in {args.output_dir}:\n"